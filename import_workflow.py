@@ -6,8 +6,7 @@ import sys
 import grp
 import pathlib
 import json
-from jax_omeroutils.xml_editor import add_projects_datasets, add_screens
-from jax_omeroutils.xml_editor import add_annotations, move_objects
+from jax_omeroutils.xml_editor import apply_metadata
 from ome_types import from_xml, to_xml
 from datetime import datetime
 from jax_omeroutils.config import OMERO_USER, OMERO_PASS
@@ -44,15 +43,7 @@ def edit_xml(target, datauser, datagroup):
     ome = from_xml(str(pathlib.Path(target) / "transfer.xml"))
     with open(str(pathlib.Path(target) / "import.json"), "r") as fp:
         imp_json = json.load(fp)
-    ome = add_projects_datasets(ome, imp_json)
-    ome = add_screens(ome, imp_json)
-    ome = add_annotations(ome, imp_json)
-    print("before move objects")
-    print(ome)
-    ome = move_objects(ome, imp_json)
-    print("after move objects")
-    print(ome)
-    print(to_xml(ome))
+    ome = apply_metadata(ome, imp_json)
     with open(str(pathlib.Path(target) / "transfer.xml"), "w") as fp:
         print(to_xml(ome), file=fp)
     return str(pathlib.Path(target) / "transfer.xml")
@@ -3,35 +3,72 @@ import logging
 import json
 import pandas as pd
 import pathlib
+from collections import defaultdict
 from functools import partial
 from getpass import getpass
 from omero.gateway import BlitzGateway
+from omero.rtypes import rlist, rstring
+from omero.sys import Parameters
 from ezomero import get_image_ids
-from ezomero import filter_by_filename
 from ezomero import link_images_to_dataset
 from jax_omeroutils.importer import set_or_create_dataset
 from jax_omeroutils.importer import set_or_create_project
 from jax_omeroutils.importer import multi_post_map_annotation
 
 CURRENT_MD_NS = 'jax.org/omeroutils/jaxlims/v0'
+# Filenames sent to the server per query in get_image_ids_by_filename
+QUERY_BATCH_SIZE = 1000
 MD_VALID_TYPES = {'xlsx': partial(pd.read_excel, dtype=str),
                   'xls': partial(pd.read_excel, dtype=str),
                   'tsv': partial(pd.read_csv, sep='\t', dtype=str)}
 
 
 def load_md(md_filepath):
-    allowed_ftypes = MD_VALID_TYPES.keys()
     if md_filepath is None:
         return None
     md_filepath = pathlib.Path(md_filepath)
     ftype = md_filepath.suffix.strip('.')
-    if ftype not in allowed_ftypes:
+    reader = MD_VALID_TYPES.get(ftype)
+    if reader is None:
         raise ValueError(f'Metadata file type {ftype} is invalid')
-    else:
-        reader = MD_VALID_TYPES[ftype]
     return reader(md_filepath)
 
 
+def get_image_ids_by_filename(conn, image_ids, filenames):
+    """Map original file names to the ids of the images among ``image_ids``.
+
+    The server is asked for the images of ``filenames``, the files listed in
+    the metadata, in batches of ``QUERY_BATCH_SIZE`` names, instead of one
+    ``filter_by_filename`` query per metadata row. The matches are then
+    restricted to ``image_ids``. Ids keep the order of ``image_ids``.
+    """
+    ids_by_filename = defaultdict(list)
+    names = sorted({n for n in filenames if n is not None})
+    if not image_ids or not names:
+        return ids_by_filename
+    orphans = set(image_ids)
+    query = ('SELECT DISTINCT i.id, o.name FROM Image i '
+             'JOIN i.fileset fs JOIN fs.usedFiles u JOIN u.originalFile o '
+             'WHERE o.name IN (:names)')
+    query_service = conn.getQueryService()
+    # search every group the user belongs to, as ezomero's lookups did
+    ctx = conn.SERVICE_OPTS.copy()
+    ctx.setOmeroGroup('-1')
+    names_by_id = defaultdict(set)
+    for start in range(0, len(names), QUERY_BATCH_SIZE):
+        params = Parameters()
+        params.map = {'names': rlist([rstring(n) for n in
+                                      names[start:start + QUERY_BATCH_SIZE]])}
+        rows = query_service.projection(query, params, ctx)
+        for row in rows:
+            if row[0].val in orphans:
+                names_by_id[row[0].val].add(row[1].val)
+    for im_id in image_ids:
+        for name in names_by_id.get(im_id, ()):
+            ids_by_filename[name].append(im_id)
+    return ids_by_filename
+
+
 def main(md_filepath, user_name, group, admin_user, server, port):
 
     # create connection and establish context
@@ -58,39 +95,63 @@ def main(md_filepath, user_name, group, admin_user, server, port):
     md_json = json.loads(md.to_json(orient='table', index=False))
 
     # loop over metadata, move and annotate matching images
-    processed_filenames = []
+    orphans_by_filename = get_image_ids_by_filename(
+        conn, orphan_ids, [row.get('filename') for row in md_json['data']])
+    processed_filenames = set()
+    dataset_images = defaultdict(list)
+    payload_images = {}  # metadata items -> (metadata, image ids)
+    project_ids = {}  # project name -> id
+    dataset_ids = {}  # (project name, dataset name) -> id
     for row in md_json['data']:
         row.pop('OMERO_group', None)  # No longer using this field
         project_name = str(row.pop('project'))
         dataset_name = str(row.pop('dataset'))
         filename = row.pop('filename')
         if filename not in processed_filenames:
-            image_ids = filter_by_filename(conn, orphan_ids, filename)
+            image_ids = orphans_by_filename.get(filename, [])
             if len(image_ids) > 0:
                 # move image into place, create projects/datasets as necessary
-                project_id = set_or_create_project(conn, project_name)
-                dataset_id = set_or_create_dataset(conn,
-                                                   project_id,
-                                                   dataset_name)
-                link_images_to_dataset(conn, image_ids, dataset_id)
-                print(f'Moved images:{image_ids} to dataset:{dataset_id}')
-
-                # map annotations
-                ns = CURRENT_MD_NS
-                map_ann_id = multi_post_map_annotation(conn,
-                                                       "Image",
-                                                       image_ids,
-                                                       row,
-                                                       ns)
-                print(f'Created annotation:{map_ann_id}'
-                      f' and linked to images:{image_ids}')
-                processed_filenames.append(filename)
+                # (looked up once per project/dataset, not once per file)
+                if project_name not in project_ids:
+                    project_ids[project_name] = set_or_create_project(
+                        conn, project_name)
+                project_id = project_ids[project_name]
+                ds_key = (project_name, dataset_name)
+                if ds_key not in dataset_ids:
+                    dataset_ids[ds_key] = set_or_create_dataset(conn,
+                                                                project_id,
+                                                                dataset_name)
+                dataset_id = dataset_ids[ds_key]
+                dataset_images[dataset_id].extend(image_ids)
+
+                # rows with identical metadata share one map annotation
+                payload = tuple(row.items())
+                if payload not in payload_images:
+                    payload_images[payload] = (row, [])
+                payload_images[payload][1].extend(image_ids)
+                processed_filenames.add(filename)
 
             else:
                 print(f'Image with filename:{filename} not found in orphans')
         else:
             print(f'Already processed images with filename:{filename}')
 
+    # link each dataset's images in one call
+    for dataset_id, image_ids in dataset_images.items():
+        link_images_to_dataset(conn, image_ids, dataset_id)
+        print(f'Moved images:{image_ids} to dataset:{dataset_id}')
+
+    # map annotations, one per distinct metadata payload
+    ns = CURRENT_MD_NS
+    for row, image_ids in payload_images.values():
+        map_ann_id = multi_post_map_annotation(conn,
+                                               "Image",
+                                               image_ids,
+                                               row,
+                                               ns)
+        print(f'Created annotation:{map_ann_id}'
+              f' and linked to images:{image_ids}')
+
     conn.close()
     print('Complete!')
 
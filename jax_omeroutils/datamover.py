@@ -1,7 +1,7 @@
 """
 This module is for "safely" moving OMERO import data from the submission folder
 to its staging location on the server for "in-place" imports. Safety comes from
-md5 checks on source and destination copy.
+checksums (BLAKE2b by default) of source and destination copy.
 """
 
 
@@ -10,39 +10,109 @@ import json
 import logging
 import shutil
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 DIR_PERM = 0o755
 FILE_PERM = 0o644
+BLOCKSIZE = 1 << 20  # 1 MiB reads keep hashing bound by disk, not the loop
+MAX_MOVE_WORKERS = 8
+
+
+def _new_md5():
+    """Return an md5 hasher, flagged as non-security use where supported.
+
+    The digest is only an integrity check on copies, so FIPS-restricted
+    builds should not refuse it (``usedforsecurity`` needs Python 3.9+).
+    """
+    try:
+        return hashlib.md5(usedforsecurity=False)
+    except TypeError:
+        return hashlib.md5()
+
+
+def _new_hasher(algorithm):
+    """Return a fresh hasher for ``algorithm`` ('blake2b' or 'md5').
+    """
+    if algorithm == 'blake2b':
+        return hashlib.blake2b(digest_size=16)
+    if algorithm == 'md5':
+        return _new_md5()
+    raise ValueError(f'Unsupported digest algorithm: {algorithm}')
+
+
+def calculate_digest(file_path, algorithm='blake2b'):
+    """Return a hex digest of a file.
+
+    Parameters
+    ----------
+    file_path : str or pathlike object
+        File to hash.
+    algorithm : {'blake2b', 'md5'}
+        Hash to use. BLAKE2b is several times faster than md5 in CPython's
+        hashlib; use 'md5' where a digest must match existing records.
+
+    Returns
+    -------
+    digest : str
+        Hexadecimal digest of the file contents.
+    """
+    hasher = _new_hasher(algorithm)
+    with open(file_path, "rb") as f:
+        # Python 3.11+ runs the read/update loop in C
+        if hasattr(hashlib, 'file_digest'):
+            return hashlib.file_digest(f, lambda: hasher).hexdigest()
+        for buf in iter(lambda: f.read(BLOCKSIZE), b''):
+            hasher.update(buf)
+    return hasher.hexdigest()
 
 
 def calculate_md5(file_path):
     """Return an md5 digest of a file.
     """
-    hasher = hashlib.md5()
-    BLOCKSIZE = 65536
-    with open(file_path, "rb") as f:
-        buf = f.read(BLOCKSIZE)
-        while len(buf) > 0:
+    return calculate_digest(file_path, algorithm='md5')
+
+
+def _copy_with_digest(src, dst, algorithm='blake2b'):
+    """Copy ``src`` to ``dst`` and return the digest of the bytes read.
+
+    The source is hashed in the same pass that copies it, so it is only
+    read once. Permission bits are copied as with ``shutil.copy``.
+    """
+    hasher = _new_hasher(algorithm)
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        for buf in iter(lambda: fsrc.read(BLOCKSIZE), b''):
             hasher.update(buf)
-            buf = f.read(BLOCKSIZE)
+            fdst.write(buf)
+    shutil.copymode(src, dst)
     return hasher.hexdigest()
 
 
-def file_mover(file_path, destination_dir, tries=3):
+def file_mover(file_path, destination_dir, tries=3, algorithm='blake2b'):
     """Safely move a file to a destination directory. Will retry if initial
-    attempts result in mismatching md5 digests.
+    attempts result in mismatching digests (see ``calculate_digest``).
+
+    Sizes are compared before any digest: a copy of the wrong size fails
+    without being read back, and a destination file left by an earlier,
+    interrupted move is only hashed (not copied again) if its size matches.
     """
     logger = logging.getLogger('intake')
     ersatz_file = destination_dir / 'test.tiff'
     if file_path.exists():
+        src_size = file_path.stat().st_size
+        dest_file = destination_dir / file_path.name
+        if (dest_file.exists() and dest_file.stat().st_size == src_size and
+                calculate_digest(file_path, algorithm) ==
+                calculate_digest(dest_file, algorithm)):
+            os.remove(file_path)
+            return str(dest_file)
         for i in range(tries):
             os.makedirs(os.path.dirname(ersatz_file), mode=DIR_PERM,
                         exist_ok=True)
             if destination_dir.exists():
-                shutil.copy(file_path, destination_dir)
-                dest_file = destination_dir / file_path.name
-                if calculate_md5(file_path) == calculate_md5(dest_file):
+                src_digest = _copy_with_digest(file_path, dest_file, algorithm)
+                if (dest_file.stat().st_size == src_size and
+                        src_digest == calculate_digest(dest_file, algorithm)):
                     os.remove(file_path)
                     return str(dest_file)
                 else:
@@ -120,6 +190,7 @@ class DataMover:
         #                           'the server. It will be imported.')
         #         os.chmod(result, FILE_PERM)
 
+        moves = []
         for target in self.fileset_list:
             src_fp = target.strip()
             subfolder_file = src_fp.split(str(self.import_path))[-1]
@@ -133,11 +204,13 @@ class DataMover:
                 subfolder_path = self.server_path
             # need to get the file subfolder structure here and
             # append to server_path
-            result = file_mover(src_fp, subfolder_path)
-            if result is not None:
-                self.logger.debug(f'Success moving file {src_fp} to ' +
-                                  'the server. It will be imported.')
-                os.chmod(result, FILE_PERM)
+            moves.append((src_fp, subfolder_path))
+
+        # files are independent, and copying/hashing releases the GIL
+        if moves:
+            workers = min(MAX_MOVE_WORKERS, len(moves))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(lambda move: self._move_file(*move), moves))
 
         # move transfer.xml
         if self.xml_path:
@@ -157,6 +230,16 @@ class DataMover:
             result = self.server_path / 'import.json'
         return f'Ready for import at:{result}'
 
+    def _move_file(self, src_fp, subfolder_path):
+        """Move one fileset file into place and make it readable.
+        """
+        result = file_mover(src_fp, subfolder_path)
+        if result is not None:
+            self.logger.debug(f'Success moving file {src_fp} to ' +
+                              'the server. It will be imported.')
+            os.chmod(result, FILE_PERM)
+        return result
+
     def set_logging(self, log_directory, timestamp):
         logfile = Path(self.import_path) / Path(f'{timestamp}.log')
         server_logfile = Path(log_directory) / Path(f'{timestamp}.log')
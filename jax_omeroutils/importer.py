@@ -8,12 +8,12 @@ intake (using the intake.py module).
 
 import logging
 from ezomero import post_dataset, post_project
-from ezomero import get_image_ids, link_images_to_dataset
+from ezomero import link_images_to_dataset
 from ezomero import post_screen, link_plates_to_screen
 from importlib import import_module
 from omero.cli import CLI
 from omero.plugins.sessions import SessionsControl
-from omero.rtypes import rstring
+from omero.rtypes import rlist, rlong, rstring
 from omero.sys import Parameters
 from omero.gateway import MapAnnotationWrapper
 from pathlib import Path
@@ -149,19 +149,32 @@ def multi_post_map_annotation(conn, object_type, object_ids, kv_dict, ns):
     if type(kv_dict) is not dict:
         raise TypeError('kv_dict must be of type `dict`')
 
-    kv_pairs = []
-    for k, v in kv_dict.items():
-        k = str(k)
-        v = str(v)
-        kv_pairs.append([k, v])
+    map_ann = _create_map_annotation(conn, _kv_pairs(kv_dict), ns)
+    _link_annotation(conn, object_type, object_ids, map_ann)
+    return map_ann.getId()
+
+
+def _kv_pairs(kv_dict):
+    """Convert a dict to the list of string pairs used by MapAnnotations.
+    """
+    return [[str(k), str(v)] for k, v in kv_dict.items()]
+
 
+def _create_map_annotation(conn, kv_pairs, ns):
+    """Create and save a new MapAnnotation, returning its wrapper.
+    """
     map_ann = MapAnnotationWrapper(conn)
     map_ann.setNs(str(ns))
     map_ann.setValue(kv_pairs)
     map_ann.save()
+    return map_ann
+
+
+def _link_annotation(conn, object_type, object_ids, map_ann):
+    """Link an existing MapAnnotation wrapper to multiple objects.
+    """
     for o in conn.getObjects(object_type, object_ids):
         o.linkAnnotation(map_ann)
-    return map_ann.getId()
 
 
 # Class definitions
@@ -226,6 +239,8 @@ class Importer:
         self.imported = False
         self.image_ids = None
         self.plate_ids = None
+        self._map_ann = None
+        self._map_ann_key = None
 
     def get_image_ids(self):
         """Get the Ids of imported images.
@@ -278,14 +293,11 @@ class Importer:
             logging.error(f'File {self.file_path} has not been imported')
             return None
         else:
-            print("time to get some IDs")
             q = self.conn.getQueryService()
-            print(q)
             params = Parameters()
             path_query = str(self.file_path).strip('/')
-            print(f"path query: f{path_query}")
+            logging.debug(f'Querying plates with client path {path_query}')
             params.map = {"cpath": rstring(path_query)}
-            print(params)
             results = q.projection(
                 "SELECT DISTINCT p.id FROM Plate p"
                 " JOIN p.plateAcquisitions pa"
@@ -297,10 +309,29 @@ class Importer:
                 params,
                 self.conn.SERVICE_OPTS
                 )
-            print(results)
             self.plate_ids = [r[0].val for r in results]
             return self.plate_ids
 
+    def _ensure_map_ann(self):
+        """Return the MapAnnotation holding ``self.md``, creating it once.
+
+        The saved annotation is cached on the Importer and reused for as long
+        as ``self.md`` and the namespace are unchanged, so that images and
+        plates from the same file share a single server-side annotation.
+
+        Returns
+        -------
+        map_ann : ``omero.gateway.MapAnnotationWrapper`` object
+            The saved MapAnnotation.
+        """
+        kv_pairs = _kv_pairs(self.md)
+        key = (CURRENT_MD_NS, tuple(sorted(tuple(kv) for kv in kv_pairs)))
+        if self._map_ann is None or self._map_ann_key != key:
+            self._map_ann = _create_map_annotation(self.conn, kv_pairs,
+                                                   CURRENT_MD_NS)
+            self._map_ann_key = key
+        return self._map_ann
+
     def annotate_images(self):
         """Post map annotation (``self.md``) to images ``self.image_ids``.
 
@@ -313,10 +344,9 @@ class Importer:
             logging.error('No image ids to annotate')
             return None
         else:
-            map_ann_id = multi_post_map_annotation(self.conn, "Image",
-                                                   self.image_ids, self.md,
-                                                   CURRENT_MD_NS)
-            return map_ann_id
+            map_ann = self._ensure_map_ann()
+            _link_annotation(self.conn, "Image", self.image_ids, map_ann)
+            return map_ann.getId()
 
     def annotate_plates(self):
         """Post map annotation (``self.md``) to plates ``self.plate_ids``.
@@ -330,10 +360,9 @@ class Importer:
             logging.error('No plate ids to annotate')
             return None
         else:
-            map_ann_id = multi_post_map_annotation(self.conn, "Plate",
-                                                   self.plate_ids, self.md,
-                                                   CURRENT_MD_NS)
-            return map_ann_id
+            map_ann = self._ensure_map_ann()
+            _link_annotation(self.conn, "Plate", self.plate_ids, map_ann)
+            return map_ann.getId()
 
     def organize_images(self):
         """Move images to ``self.project``/``self.dataset``.
@@ -346,7 +375,23 @@ class Importer:
         if not self.image_ids:
             logging.error('No image ids to organize')
             return False
-        orphans = get_image_ids(self.conn)
+        q = self.conn.getQueryService()
+        params = Parameters()
+        params.map = {"ids": rlist([rlong(i) for i in self.image_ids])}
+        # orphans are images in neither a dataset nor a well, in any group
+        ctx = self.conn.SERVICE_OPTS.copy()
+        ctx.setOmeroGroup('-1')
+        results = q.projection(
+            "SELECT i.id FROM Image i"
+            " WHERE i.id IN (:ids)"
+            " AND NOT EXISTS ("
+            "SELECT dl FROM DatasetImageLink dl WHERE dl.child.id = i.id)"
+            " AND NOT EXISTS ("
+            "SELECT ws FROM WellSample ws WHERE ws.image.id = i.id)",
+            params,
+            ctx
+            )
+        orphans = {r[0].val for r in results}
         for im_id in self.image_ids:
             if im_id not in orphans:
                 logging.error(f'Image:{im_id} not an orphan')
@@ -6,20 +6,48 @@ and is not suitable for handling, e.g., HCS plate imports.
 """
 
 
+import atexit
 import logging
+import os
 import pathlib
 import json
-import pandas as pd
-from datetime import datetime
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
 from importlib import import_module
-from ezomero import get_user_id
-from omero.cli import CLI
-ImportControl = import_module("omero.plugins.import").ImportControl
+from itertools import islice
+from logging.handlers import QueueHandler, QueueListener
+from openpyxl import load_workbook
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    from python_calamine import CalamineWorkbook
+except ImportError:
+    CalamineWorkbook = None
 
 # This variable indicates the path in which new OMERO submissions will be
 # staged for "in-place" imports
 BASE_SERVER_PATH = pathlib.Path('/nfs/hyperfile/omero/autoimport/')
 
+# Upper bound on threads used to validate import targets with Bio-Formats
+MAX_VALIDATION_WORKERS = 16
+
+# Most non-blank file rows accepted in one submission form
+MAX_MD_ROWS = 10000
+
+# Seconds for which group memberships fetched from OMERO are reused
+GROUP_CACHE_TTL = 60
+
+# (host, port, group name) -> (time fetched, set of member usernames)
+_group_cache = {}
+
+# Per-thread state, see ``_get_import_cli``
+_thread_local = threading.local()
+
 
 # Function definitions #
 ########################
@@ -55,38 +83,48 @@ def find_md_file(import_directory):
     Import metadata file found at: dropbox/djme_20200101/import_me.xlsx
     """
     logger = logging.getLogger('intake')
-    import_directory = pathlib.Path(import_directory)
-    md_files = []
-    for f in import_directory.iterdir():
-        if f.suffix.endswith('xlsx'):
-            md_files.append(f)
-    if len(md_files) == 0:
+    md_filepath = None
+    with os.scandir(import_directory) as it:
+        for entry in it:
+            if entry.name.endswith('.xlsx') and entry.is_file():
+                if md_filepath is not None:
+                    # no need to look any further, this is already an error
+                    logger.error('>1 metadata files found, can not ' +
+                                 'process. Is your spreadsheet open? ' +
+                                 'Please close it!')
+                    return None
+                md_filepath = pathlib.Path(entry.path)
+    if md_filepath is None:
         logger.error('No valid metadata file found - have you added an ' +
                      'Excel spreadsheet to your files?')
-        md_filepath = None
-    elif len(md_files) > 1:
-        logger.error('>1 metadata files found, can not process. Is your ' +
-                     'spreadsheet open? Please close it!')
-        md_filepath = None
-    else:
-        md_filepath = md_files[0]
     return md_filepath
 
 
-def load_md_from_file(md_filepath, sheet_name=0):
-    """Load metadata from file into ``pandas.DataFrame`` object.
+def load_md_from_file(md_filepath, sheet_name=0, max_rows=MAX_MD_ROWS):
+    """Load metadata from a submission form into a dict.
+
+    The workbook is opened once and its rows are streamed:
+    the first four rows hold the OMERO user and group, the fifth row holds
+    the column names and every following row describes one file.
 
     Parameters
     ----------
     md_filepath : str, pathlike object, or None
         Path to file to attempt to load.
-    sheet_name : str, int, list or None
-        Passed to ``pd.read_excel``.
+    sheet_name : str or int
+        Name or (zero-based) index of the worksheet to read.
+    max_rows : int or None
+        Maximum number of non-blank file rows below the column names. A form
+        with more rows than this raises ``ValueError`` rather than being
+        partially read. `None` removes the limit. Blank rows, such as the
+        long empty tails often left behind in user-edited spreadsheets, are
+        skipped and do not count. Defaults to ``MAX_MD_ROWS``.
 
     Returns
     -------
-    md : pandas.DataFrame
-        Metadata for subsequent OMERO import steps.
+    md : dict
+        Metadata for subsequent OMERO import steps, with keys 'omero_user',
+        'omero_group' and 'file_metadata' (a list of dicts, one per row).
 
     Notes
     -----
@@ -94,10 +132,81 @@ def load_md_from_file(md_filepath, sheet_name=0):
     that function will return `None` if no single metadata file is found, this
     function can take `None` as input, returning `None`.
     """
-    logger = logging.getLogger('intake')
     if md_filepath is None:
         return None
-    md_filepath = pathlib.Path(md_filepath)
+    md_filepath = _check_md_filepath(md_filepath)
+    rows = _iter_sheet_rows(md_filepath, sheet_name)
+    try:
+        md_json = _parse_md_header(_read_header_rows(rows, sheet_name))
+        md_json['file_metadata'] = _parse_md_body(rows, max_rows)
+    finally:
+        rows.close()
+    return (md_json)
+
+
+def load_md_header(md_filepath, sheet_name=0):
+    """Load only the OMERO user and group from a submission form.
+
+    Only the first four rows of the worksheet are read, so that a submission
+    with, e.g., a misspelled group can be rejected before its file rows are
+    parsed. See ``load_md_body`` for the rest of the form.
+
+    Parameters
+    ----------
+    md_filepath : str, pathlike object, or None
+        Path to file to attempt to load.
+    sheet_name : str or int
+        Name or (zero-based) index of the worksheet to read.
+
+    Returns
+    -------
+    md : dict
+        Dict with keys 'omero_user' and 'omero_group', or `None` if
+        ``md_filepath`` is `None`.
+    """
+    if md_filepath is None:
+        return None
+    md_filepath = _check_md_filepath(md_filepath)
+    rows = _iter_sheet_rows(md_filepath, sheet_name)
+    try:
+        return _parse_md_header(_read_header_rows(rows, sheet_name))
+    finally:
+        rows.close()
+
+
+def load_md_body(md_filepath, sheet_name=0, max_rows=MAX_MD_ROWS):
+    """Load only the per-file rows from a submission form.
+
+    Parameters
+    ----------
+    md_filepath : str or pathlike object
+        Path to file to attempt to load.
+    sheet_name : str or int
+        Name or (zero-based) index of the worksheet to read.
+    max_rows : int or None
+        Maximum number of file rows to read, see ``load_md_from_file``.
+
+    Returns
+    -------
+    file_metadata : list of dicts
+        One dict per file row, as under ``md['file_metadata']`` in the output
+        of ``load_md_from_file``.
+    """
+    md_filepath = _check_md_filepath(md_filepath)
+    rows = _iter_sheet_rows(md_filepath, sheet_name)
+    try:
+        _read_header_rows(rows, sheet_name)
+        return _parse_md_body(rows, max_rows)
+    finally:
+        rows.close()
+
+
+def _check_md_filepath(md_filepath):
+    """Return ``md_filepath`` as a Path, checking it is an existing xlsx.
+    """
+    logger = logging.getLogger('intake')
+    if not isinstance(md_filepath, pathlib.Path):
+        md_filepath = pathlib.Path(md_filepath)
     if not md_filepath.exists():
         logger.error(f'Cannot find file {md_filepath} - have you moved it?')
         raise FileNotFoundError(f'No such file: {md_filepath}')
@@ -105,62 +214,308 @@ def load_md_from_file(md_filepath, sheet_name=0):
         logger.error('Only spreadsheets with xlsx extensions are accepted. ' +
                      'Please use our template for submission!')
         raise ValueError('File suffix must be xlsx')
+    return md_filepath
 
+
+def _read_header_rows(rows, sheet_name):
+    """Take the four header rows from the row iterator of a submission form.
+    """
+    logger = logging.getLogger('intake')
     try:
-        md_header = pd.read_excel(md_filepath,
-                                  sheet_name=sheet_name,
-                                  nrows=4,
-                                  index_col=0,
-                                  header=None,
-                                  dtype=str,
-                                  engine="openpyxl")
-    except ValueError:
-        logger.error('Your spreadsheet does not have a Submission Form sheet' +
-                     ' - please use our template for submission!')
+        return list(islice(rows, 4))
+    except KeyError:
+        logger.error('Your spreadsheet does not have a Submission Form ' +
+                     'sheet - please use our template for submission!')
         raise ValueError(f"Worksheet {sheet_name} does not exist.")
-    md = pd.read_excel(md_filepath,
-                       sheet_name=sheet_name,
-                       skiprows=range(4),
-                       dtype=str,
-                       engine="openpyxl")
-
-    # fixing rogue lines, rogue columns, rogue leading/trailing spaces
-    # in any string column
-    md = md.applymap(lambda x: x.strip() if isinstance(x, str) else x)
-    if 'project' in md.columns:
-        md = md.dropna(subset=['filename', 'project', 'dataset'])\
-             .dropna(axis='columns', how='all')
-        if md.empty:
+
+
+def _parse_md_header(header_rows):
+    """Extract the OMERO user and group from the header rows of a form.
+    """
+    logger = logging.getLogger('intake')
+    # protect against extra spaces on 'omero user' and 'omero group',
+    # and against empty user and group
+    md_header = {}
+    for row in header_rows:
+        if row and row[0] is not None:
+            value = _cell_to_str(row[1]) if len(row) > 1 else None
+            md_header[str(row[0]).strip()] = value or ''
+
+    md_json = {}
+    try:
+        md_json['omero_user'] = md_header['OMERO user:']
+        md_json['omero_group'] = md_header['OMERO group:']
+    except KeyError:
+        logger.error("Your spreadsheet does not have 'OMERO user:' or " +
+                     "'OMERO group:' fields, or you have added your" +
+                     " username/group on the same cell as those fields! " +
+                     "Please add them on column B.")
+        raise KeyError("User and group fields are non-existent or malformed.")
+    return md_json
+
+
+def _parse_md_body(rows, max_rows):
+    """Build the per-file metadata from the rows following the header.
+
+    The first row gives the column names. Rows missing a filename and
+    project/dataset (or screen) are dropped, as are columns left empty on
+    every row. Blank rows are skipped up to the end of the sheet. Raises
+    ``ValueError`` if there are more than ``max_rows`` non-blank rows.
+    """
+    logger = logging.getLogger('intake')
+    columns = _dedupe_columns([f'Unnamed: {i}' if c is None else c
+                               for i, c in enumerate(next(rows, ()))])
+    md = []
+    for row in rows:
+        values = [_cell_to_str(v) for v in row[:len(columns)]]
+        # skip rogue lines
+        if all(v is None for v in values):
+            continue
+        if max_rows is not None and len(md) >= max_rows:
+            logger.error(f'Your spreadsheet has more than {max_rows} ' +
+                         'file rows. Please split it into smaller ' +
+                         'submissions.')
+            raise ValueError(f'Spreadsheet has more than {max_rows} rows')
+        values += [None] * (len(columns) - len(values))
+        md.append(dict(zip(columns, values)))
+
+    if 'project' in columns:
+        md = [r for r in md
+              if None not in (r.get('filename'), r['project'],
+                              r.get('dataset'))]
+        if not md:
             logger.error('Your spreadsheet rows need to contain ' +
                          'filename, project and dataset names. Cannot ' +
                          'proceed with import.')
             raise ValueError('Spreadsheet needs filename, project and dataset')
-    elif 'screen' in md.columns:
-        md = md.dropna(subset=['filename', 'screen'])\
-             .dropna(axis='columns', how='all')
-        if md.empty:
+    elif 'screen' in columns:
+        md = [r for r in md
+              if None not in (r.get('filename'), r['screen'])]
+        if not md:
             logger.error('Your spreadsheet rows need to contain ' +
                          'filename and screen names. Cannot ' +
                          'proceed with import.')
             raise ValueError('Spreadsheet needs filename and screen')
 
-    # protect against extra spaces on 'omero user' and 'omero group'
-    md_header.index = md_header.index.str.strip()
-    # protect against empty user and group
-    md_header = md_header.fillna('')
-    md_json = {}
+    # drop rogue columns, i.e. those left empty on every row
+    filled = {c for r in md for c, v in r.items() if v is not None}
+    return [{c: v for c, v in r.items() if c in filled} for r in md]
+
+
+def _dedupe_columns(columns):
+    """Make repeated column names unique, as pandas does ('x', 'x.1', ...).
+
+    Without this, a later column would silently overwrite an earlier one
+    with the same name when rows are turned into dicts.
+    """
+    logger = logging.getLogger('intake')
+    counts = {}
+    unique = []
+    for col in columns:
+        name = col
+        while name in counts:
+            counts[col] += 1
+            name = f'{col}.{counts[col]}'
+        if name != col:
+            logger.warning(f'Column name {col} is repeated in your ' +
+                           f'spreadsheet, reading it as {name}.')
+        counts[name] = 0
+        unique.append(name)
+    return unique
+
+
+def _is_blank(value):
+    """Return True if a metadata value is missing, empty or NaN.
+    """
+    if isinstance(value, str):
+        return value in ('', 'nan')
+    return value is None or value != value
+
+
+def _get_group_members(conn, group):
+    """Return the names of all owners and members of an OMERO group.
+
+    Members are fetched with a single query rather than by listing every
+    group on the server. They are cached per server for ``GROUP_CACHE_TTL``
+    seconds, so that batches processed in the same session skip the round
+    trip.
+
+    Parameters
+    ----------
+    conn : ``omero.gateway.BlitzGateway`` object
+        OMERO connection.
+    group : str
+        Name of the group.
+
+    Returns
+    -------
+    members : set of str or None
+        Usernames in the group, or `None` if no such group exists.
+    """
+    from omero.rtypes import rstring
+    from omero.sys import Parameters
+
+    now = time.monotonic()
+    key = (conn.host, conn.port, group)
+    cached = _group_cache.get(key)
+    if cached is not None and now - cached[0] < GROUP_CACHE_TTL:
+        return cached[1]
+    q = conn.getQueryService()
+    params = Parameters()
+    params.map = {"gname": rstring(group)}
+    results = q.projection(
+        "SELECT g.id, e.omeName FROM ExperimenterGroup g"
+        " LEFT OUTER JOIN g.groupExperimenterMap m"
+        " LEFT OUTER JOIN m.child e"
+        " WHERE g.name = :gname",
+        params,
+        conn.SERVICE_OPTS
+        )
+    if len(results) == 0:
+        return None
+    names = {r[1].val for r in results if r[1] is not None}
+    _group_cache[key] = (now, names)
+    return names
+
+
+def _get_user_email(conn, user):
+    """Return the email address of an OMERO user, or `None` if unset.
+    """
+    from omero.rtypes import rstring
+    from omero.sys import Parameters
+
+    q = conn.getQueryService()
+    params = Parameters()
+    params.map = {"uname": rstring(user)}
+    results = q.projection(
+        "SELECT e.email FROM Experimenter e WHERE e.omeName = :uname",
+        params,
+        conn.SERVICE_OPTS
+        )
+    if len(results) == 0 or results[0][0] is None:
+        return None
+    return results[0][0].val
+
+
+def _dump_json(obj, json_path):
+    """Write ``obj`` as JSON to ``json_path``.
+
+    orjson is used when it is installed, as it serializes much faster than
+    the standard library and writes the UTF-8 bytes in one go.
+    """
+    if orjson is None:
+        with open(json_path, 'w') as fp:
+            json.dump(obj, fp)
+    else:
+        data = orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+        pathlib.Path(json_path).write_bytes(data)
+
+
+def _new_import_cli():
+    """Return a new OMERO CLI with the import plugin registered.
+
+    The OMERO CLI and its import plugin pull in Ice when loaded, so they are
+    imported here rather than at module level. Callers that only need, e.g.,
+    ``find_md_file`` never pay that cost.
+    """
+    from omero.cli import CLI
+    ImportControl = import_module("omero.plugins.import").ImportControl
+    cli = CLI()
+    cli.register('import', ImportControl, '_')
+    return cli
+
+
+def _get_import_cli():
+    """Return the calling thread's OMERO CLI, creating it on first use.
+
+    The OMERO CLI is not thread-safe, so each thread keeps its own.
+    """
+    cli = getattr(_thread_local, 'cli', None)
+    if cli is None:
+        cli = _thread_local.cli = _new_import_cli()
+    return cli
+
+
+def _iter_validated_targets(targets):
+    """Validate existing import targets, yielding each once it is checked.
+
+    Validation is dominated by Bio-Formats reading each file, so targets are
+    checked concurrently, each thread with its own CLI. Targets are still
+    yielded in the order of ``targets``, so logs are the same on every run.
+    """
+    to_validate = [t for t in targets if t.exists]
+    if not to_validate:
+        return
+    n_workers = min(MAX_VALIDATION_WORKERS, len(to_validate))
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        results = executor.map(ImportTarget.validate_target, to_validate)
+        for imp_target, _ in zip(to_validate, results):
+            yield imp_target
+
+
+def _iter_sheet_rows(md_filepath, sheet_name):
+    """Yield the rows of a worksheet as tuples, with `None` for empty cells.
+
+    python-calamine is used to read the workbook when it is installed, as it
+    is much faster than openpyxl; otherwise openpyxl is used in read-only
+    mode. Either way rows are produced lazily, so callers that stop early
+    do not pay for the rest of the sheet, and the workbook is closed when
+    the generator is. Raises ``KeyError`` if the worksheet does not exist.
+    """
+    if CalamineWorkbook is not None:
+        wb = CalamineWorkbook.from_path(str(md_filepath))
+        try:
+            names = wb.sheet_names
+            if not isinstance(sheet_name, str):
+                if not -len(names) <= sheet_name < len(names):
+                    raise KeyError(sheet_name)
+                sheet_name = names[sheet_name]
+            elif sheet_name not in names:
+                raise KeyError(sheet_name)
+            ws = wb.get_sheet_by_name(sheet_name)
+            # calamine's rows begin at the first non-empty cell; pad them so
+            # row and column positions match the sheet, as with openpyxl
+            start_row, start_col = ws.start or (0, 0)
+            for _ in range(start_row):
+                yield ()
+            pad = (None,) * start_col
+            for row in ws.iter_rows():
+                yield pad + tuple(None if v == '' else v for v in row)
+        finally:
+            wb.close()
+        return
+
+    wb = load_workbook(str(md_filepath), read_only=True, data_only=True)
     try:
-        # added 'strip' to protect against leading/trailing spaces
-        md_json['omero_user'] = md_header.loc['OMERO user:', 1].strip()
-        md_json['omero_group'] = md_header.loc['OMERO group:', 1].strip()
-        md_json['file_metadata'] = md.to_dict(orient='records')
-    except KeyError:
-        logger.error("Your spreadsheet does not have 'OMERO user:' or " +
-                     "'OMERO group:' fields, or you have added your" +
-                     " username/group on the same cell as those fields! " +
-                     "Please add them on column B.")
-        raise KeyError("User and group fields are non-existent or malformed.")
-    return (md_json)
+        try:
+            if isinstance(sheet_name, str):
+                ws = wb[sheet_name]
+            else:
+                ws = wb.worksheets[sheet_name]
+        except IndexError:
+            raise KeyError(sheet_name)
+        yield from ws.iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+
+def _cell_to_str(value):
+    """Convert a spreadsheet cell value to a stripped string.
+
+    Empty cells, including those holding only whitespace, are returned as
+    `None`. Whole-number floats lose their trailing '.0', matching how the
+    values appear in the spreadsheet. Dates are written as datetimes
+    ('2020-01-02 00:00:00'), whichever reader produced them, so annotations
+    do not depend on whether python-calamine is installed.
+    """
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    elif isinstance(value, date) and not isinstance(value, datetime):
+        # calamine reads date cells as dates, openpyxl as midnight datetimes
+        value = datetime.combine(value, datetime.min.time())
+    return str(value).strip() or None
 
 
 # Class definitions #
@@ -174,6 +529,8 @@ class ImportBatch:
     The assumption is that each file equals one row in the xlsx metadata form.
     This class should not be used for situations such as HCS plate imports, as
     the assumptions about how to handle the images and metadata will not hold.
+    The batch can be used as a context manager, which closes the metadata form
+    left open by ``load_md_header`` on exit.
 
     Parameters
     ----------
@@ -196,6 +553,9 @@ class ImportBatch:
         Email address for user, as pulled from OMERO.
     md : dict or None
         Loaded metadata, as output from ``load_md_from_file``.
+    md_filepath : ``pathlib.Path`` object or None
+        Path to the metadata form, set by ``self.load_md_header`` or
+        ``self.load_md``.
     valid_md : boolean
         Flag to set if import form passes all checks for validity
         (`self.validate_import_md`)
@@ -215,6 +575,9 @@ class ImportBatch:
         self.group = None  # OMERO group
         self.user_email = None  # user email address pulled from OMERO
         self.md = None
+        self.md_filepath = None  # path to the metadata form
+        self._md_rows = None  # open row stream left by load_md_header
+        self._md_sheet = None  # worksheet that self._md_rows reads
         self.valid_md = False
         self.server_path = None  # where images will live on server
         self.conn = conn  # OMERO connection
@@ -222,10 +585,14 @@ class ImportBatch:
         self.logger = logging.getLogger('intake')
 
     def set_logging(self, log_directory, timestamp):
-        logfile = pathlib.Path(self.import_path) / \
-            pathlib.Path(f'{timestamp}.log')
-        server_logfile = pathlib.Path(log_directory) / \
-            pathlib.Path(f'{timestamp}.log')
+        """Log to the import directory, the server log directory and stderr.
+
+        Records are handed to a background listener thread through a queue,
+        so formatting and the (possibly NFS-backed) file writes happen off
+        the calling thread. The listener is flushed and stopped at exit.
+        """
+        logfile = self.import_path / f'{timestamp}.log'
+        server_logfile = pathlib.Path(log_directory) / f'{timestamp}.log'
         self.logger.setLevel(logging.DEBUG)
         fh = logging.FileHandler(logfile)
         fh.setLevel(logging.DEBUG)
@@ -233,18 +600,80 @@ class ImportBatch:
         sh.setLevel(logging.DEBUG)
         ch = logging.StreamHandler()
         ch.setLevel(logging.DEBUG)
-        self.logger.addHandler(fh)
-        self.logger.addHandler(sh)
-        self.logger.addHandler(ch)
-
-    def load_md(self, sheet_name="Submission Form"):
+        log_queue = queue.SimpleQueue()
+        self._log_listener = QueueListener(log_queue, fh, sh, ch,
+                                           respect_handler_level=True)
+        self._log_listener.start()
+        atexit.register(self._log_listener.stop)
+        self.logger.addHandler(QueueHandler(log_queue))
+
+    def load_md_header(self, sheet_name="Submission Form"):
+        """Populate self.md with the OMERO user and group only
+
+        This reads just the header of the metadata form, so that
+        ``self.validate_user_group`` can run before the file rows are parsed.
+        Call ``self.load_md`` afterwards to load the rest of the form: the
+        worksheet is kept open and ``self.load_md`` carries on from the row
+        after the header, so the workbook is only opened once. Use the batch
+        as a context manager (or call ``self.close``) so the worksheet is
+        closed if the batch is abandoned in between. If no metadata form is
+        found, self.md will remain None. Nothing is returned.
+        """
+        self.close()
+        self.md_filepath = find_md_file(self.import_path)
+        self.md = None
+        if self.md_filepath is None:
+            return
+        rows = _iter_sheet_rows(_check_md_filepath(self.md_filepath),
+                                sheet_name)
+        try:
+            self.md = _parse_md_header(_read_header_rows(rows, sheet_name))
+        except Exception:
+            rows.close()
+            raise
+        self._md_rows = rows
+        self._md_sheet = sheet_name
+
+    def load_md(self, sheet_name="Submission Form", max_rows=MAX_MD_ROWS):
         """Populate self.md
 
-        If no metadata form is found, self.md will remain None. Nothing is
-        returned.
+        If only the header was loaded with ``self.load_md_header``, the file
+        rows are read from the same worksheet and added to it; ``sheet_name``
+        must then match the one given to ``self.load_md_header``, or
+        ``ValueError`` is raised. If no metadata form is found, self.md will
+        remain None. ``max_rows`` is passed to ``load_md_from_file``.
+        Nothing is returned.
         """
-        self.md = load_md_from_file(find_md_file(self.import_path),
-                                    sheet_name=sheet_name)
+        if self._md_rows is not None:
+            if sheet_name != self._md_sheet:
+                self.logger.error('Header was read from sheet ' +
+                                  f'{self._md_sheet}, not {sheet_name}.')
+                raise ValueError('load_md sheet_name differs from ' +
+                                 'load_md_header')
+            try:
+                self.md['file_metadata'] = _parse_md_body(self._md_rows,
+                                                          max_rows)
+            finally:
+                self.close()
+        else:
+            self.md_filepath = find_md_file(self.import_path)
+            self.md = load_md_from_file(self.md_filepath,
+                                        sheet_name=sheet_name,
+                                        max_rows=max_rows)
+
+    def close(self):
+        """Close the worksheet left open by ``self.load_md_header``, if any.
+        """
+        if self._md_rows is not None:
+            self._md_rows.close()
+            self._md_rows = None
+            self._md_sheet = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
     def validate_user_group(self, user=None, group=None):
         """Validate omero user and group
@@ -265,44 +694,35 @@ class ImportBatch:
             group = self.md['omero_group']
 
         # Check group
-        for g in self.conn.listGroups():
-            if g.getName() == group:
-                group_summary = g.groupSummary()
-                self.group = group
-
-                # Check user is a part of group
-                userlist = group_summary[0]
-                userlist.extend(group_summary[1])
-                userlist = [u.getName() for u in userlist]
-                if user not in userlist:
-                    self.logger.error(f'User {user} is not in group {group} ' +
-                                      f'and/or user {user} does not exist. ' +
-                                      'Please double-check the spelling and ' +
-                                      'note that usernames and group ' +
-                                      'names are case sensitive!')
-                    raise ValueError('User non-existent or not in group.')
-                else:
-                    self.user = user
-                    userid = get_user_id(self.conn, self.user)
-                    user_obj = self.conn.getObject('Experimenter', userid)
-                    self.user_email = user_obj._obj.email._val
-                    return True
-        self.logger.error(f'Group {group} was not found. Please ' +
-                          'double-check the spelling and note that ' +
-                          'usernames and group names are case sensitive!')
-        raise ValueError('group not found.')
+        members = _get_group_members(self.conn, group)
+        if members is None:
+            self.logger.error(f'Group {group} was not found. Please ' +
+                              'double-check the spelling and note that ' +
+                              'usernames and group names are case ' +
+                              'sensitive!')
+            raise ValueError('group not found.')
+        self.group = group
+
+        # Check user is a part of group
+        if user not in members:
+            self.logger.error(f'User {user} is not in group {group} ' +
+                              f'and/or user {user} does not exist. ' +
+                              'Please double-check the spelling and ' +
+                              'note that usernames and group ' +
+                              'names are case sensitive!')
+            raise ValueError('User non-existent or not in group.')
+        self.user = user
+        self.user_email = _get_user_email(self.conn, self.user)
+        return True
 
     def set_server_path(self):
         """Set ``self.server_path`` based on group, user, and import date.
         """
         group_directory = self.group.lower().replace(' ', '_')
-        group_directory = pathlib.Path(group_directory)
-
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-
-        batch_directory = pathlib.Path(f'{self.user}_{timestamp}')
-
-        self.server_path = BASE_SERVER_PATH / group_directory / batch_directory
+        batch_directory = f'{self.user}_{timestamp}'
+        self.server_path = BASE_SERVER_PATH.joinpath(group_directory,
+                                                     batch_directory)
 
     def validate_import_md(self):
         """Check whether the supplied metadata is valid.
@@ -321,82 +741,68 @@ class ImportBatch:
         Each row of the metadata file is expected to point to one unique
         OMERO import target.
         """
-        self.valid_md = True
-        for filemd in self.md['file_metadata']:
-            if 'filename' not in filemd.keys():
-                self.logger.error('Column \'filename\' is missing in your ' +
-                                  'spreadsheet!')
-                self.valid_md = False
-                return False
-            elif (str(filemd['filename']) == '' or
-                  str(filemd['filename']) == 'nan'):
-                self.logger.error('You have an empty filename in your ' +
-                                  'spreadsheet. Please double-check!')
-                self.valid_md = False
-                return False
-
-            if 'dataset' not in filemd.keys():
-                if 'screen' not in filemd.keys():
-                    self.logger.error('You need either a \'dataset\' ' +
-                                      'or a \'screen\' column in your' +
-                                      'spreadsheet!')
-                    self.valid_md = False
-                    return False
-                elif (str(filemd['screen']) == '' or
-                      str(filemd['screen']) == 'nan'):
-                    self.logger.error('You have an empty screen name in ' +
-                                      'your spreadsheet. Please double-check!')
-                    self.valid_md = False
-                    return False
+        self.valid_md = False
+        rows = self.md['file_metadata']
+        if len(rows) == 0:
+            self.logger.error('Your spreadsheet does not list any files!')
+            return False
 
-            elif (str(filemd['dataset']) == '' or
-                  str(filemd['dataset']) == 'nan'):
-                self.logger.error('You have an empty dataset name in ' +
-                                  'your spreadsheet. Please double-check!')
-                self.valid_md = False
+        # Which columns are required depends only on the spreadsheet's
+        # columns, so work that out once rather than row by row
+        columns = rows[0].keys()
+        if 'filename' not in columns:
+            self.logger.error('Column \'filename\' is missing in your ' +
+                              'spreadsheet!')
+            return False
+        required = ['filename']
+        for col in ('dataset', 'project'):
+            if col in columns:
+                required.append(col)
+            elif 'screen' not in columns:
+                self.logger.error(f'You need either a \'{col}\' or a ' +
+                                  '\'screen\' column in your spreadsheet!')
                 return False
-
-            if 'project' not in filemd.keys():
-                if 'screen' not in filemd.keys():
-                    self.logger.error('You need either a \'project\' or a ' +
-                                      '\'screen\' column in your spreadsheet!')
-                    self.valid_md = False
-                    return False
-                elif (str(filemd['screen']) == '' or
-                      str(filemd['screen']) == 'nan'):
-                    self.logger.error('You have an empty screen name in ' +
-                                      'your spreadsheet. Please double-check!')
-                    self.valid_md = False
+            elif 'screen' not in required:
+                required.append('screen')
+
+        seen = set()
+        for filemd in rows:
+            for col in required:
+                if _is_blank(filemd.get(col)):
+                    name = col if col == 'filename' else f'{col} name'
+                    self.logger.error(f'You have an empty {name} in your ' +
+                                      'spreadsheet. Please double-check!')
                     return False
-            elif (str(filemd['project']) == '' or
-                  str(filemd['project']) == 'nan'):
-                self.logger.error('You have an empty project name in ' +
-                                  'your spreadsheet. Please double-check!')
-                self.valid_md = False
-                return False
 
-        # Check for duplicate filenames in metadata
-        file_list_md = [f['filename'] for f in self.md['file_metadata']]
-        if len(set(file_list_md)) < len(file_list_md):
-            self.logger.error('Spreadsheet contains duplicate filenames. ' +
-                              'Please double-check!')
-            self.valid_md = False
-            return False
+            # Check for duplicate filenames in metadata
+            if filemd['filename'] in seen:
+                self.logger.error('Spreadsheet contains duplicate ' +
+                                  'filenames. Please double-check!')
+                return False
+            seen.add(filemd['filename'])
 
+        self.valid_md = True
         return True
 
     def load_targets(self):
         """Populate ``self.import_target_list`` with valid ImportTarget objects
         """
-        for md_entry in self.md['file_metadata']:
-            imp_target = ImportTarget(self.import_path, md_entry)
-            if imp_target.exists:
-                imp_target.validate_target()
-            else:
+        # one directory listing instead of a stat call per target
+        try:
+            with os.scandir(self.import_path) as it:
+                present = {entry.name for entry in it}
+        except FileNotFoundError:
+            present = set()
+        targets = [ImportTarget(self.import_path, md_entry, present=present)
+                   for md_entry in self.md['file_metadata']]
+        for imp_target in targets:
+            if not imp_target.exists:
                 err = f'Target does not exist: {imp_target.path_to_target}. '\
                       + 'This file is in your spreadsheet but not in your '\
                       + 'folder, and will not be imported.'
                 self.logger.error(err)
+
+        for imp_target in _iter_validated_targets(targets):
             if imp_target.valid_target is True:
                 self.import_target_list.append(imp_target)
             elif imp_target.valid_target is False:
@@ -424,18 +830,15 @@ class ImportBatch:
                               "import targets. Skipping empty import.")
             return False
         else:
-            import_json = {}
-            import_json['user'] = self.user
-            import_json['group'] = self.group
-            import_json['user_email'] = self.user_email
-            import_json['user_supplied_md'] = self.md
-            import_json['server_path'] = str(self.server_path)
-            import_json['import_path'] = str(self.import_path)
-            # import_json['import_targets'] = []
-            # for target in self.import_target_list:
-            #     import_json['import_targets'].append(target.target_md)
-            with open(self.import_path / 'import.json', 'w') as fp:
-                json.dump(import_json, fp)
+            import_json = {'user': self.user,
+                           'group': self.group,
+                           'user_email': self.user_email,
+                           'user_supplied_md': self.md,
+                           'server_path': str(self.server_path),
+                           'import_path': str(self.import_path)}
+            # import_json['import_targets'] = [
+            #     target.target_md for target in self.import_target_list]
+            _dump_json(import_json, self.import_path / 'import.json')
             return True
 
     def write_filelist(self):
@@ -461,6 +864,10 @@ class ImportTarget:
         metadata form as processed by ``load_md_from_file``. In that case,
         a single ``md_entry`` corresponds to an item under
         ``md['file_metadata']``.
+    present : set of str, optional
+        Names of the entries in ``import_path``, if already listed. Used to
+        check that the file exists without a stat call; files in
+        subdirectories are always checked on disk.
 
     Attributes
     ----------
@@ -474,22 +881,33 @@ class ImportTarget:
         Set by ``self.validate_target``
     """
 
-    def __init__(self, import_path, md_entry):
+    def __init__(self, import_path, md_entry, present=None):
         self.target_md = md_entry
-        self.path_to_target = import_path / self.target_md['filename']
-        self.exists = self.path_to_target.exists()
+        filename = self.target_md['filename']
+        self.path_to_target = import_path / filename
+        if present is not None and os.sep not in filename:
+            self.exists = filename in present
+        else:
+            self.exists = self.path_to_target.exists()
         self.valid_target = None
 
-    def validate_target(self):
+    def validate_target(self, cli=None):
         """Check whether an import target can be imported by OMERO
 
         This used the OMERO CLI, but since it is just checking whether
         the file can be interpreted by BioFormats, there is no connection
         required.
-        """
 
-        cli = CLI()
-        cli.register('import', ImportControl, '_')
+        Parameters
+        ----------
+        cli : ``omero.cli.CLI`` object, optional
+            CLI with the import plugin registered. If not supplied, the
+            calling thread's cached CLI is used, so the plugin is only
+            registered once per thread.
+        """
+        if cli is None:
+            cli = _get_import_cli()
+        cli.rv = None
         cli.invoke(['import', '-f', str(self.path_to_target)])
 
         if cli.rv == 0:
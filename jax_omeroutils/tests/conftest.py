@@ -1,11 +1,8 @@
 import os
 import pytest
-import ezomero
-from omero.cli import CLI
 from omero.gateway import BlitzGateway
-from omero.plugins.sessions import SessionsControl
-from omero.plugins.user import UserControl
-from omero.plugins.group import GroupControl
+from omero.model import ExperimenterGroupI, ExperimenterI, PermissionsI
+from omero.rtypes import rbool, rstring
 
 # Settings for OMERO
 DEFAULT_OMERO_USER = "root"
@@ -18,6 +15,12 @@ DEFAULT_OMERO_SECURE = 1
 GROUPS_TO_CREATE = [['test_group_1', 'read-only'],
                     ['test_group_2', 'read-only']]
 
+# permission strings for the group types accepted by `omero group add`
+GROUP_PERMS = {'private': 'rw----',
+               'read-only': 'rwr---',
+               'read-annotate': 'rwra--',
+               'read-write': 'rwrw--'}
+
 # [user, [groups to be added to], [groups to own]]
 USERS_TO_CREATE = [
                    [
@@ -65,66 +68,40 @@ def omero_params(request):
 
 
 @pytest.fixture(scope='session')
-def users_groups(conn, omero_params):
-    session_uuid = conn.getSession().getUuid().val
-    user = omero_params[0]
-    host = omero_params[2]
-    port = str(omero_params[3])
-    cli = CLI()
-    cli.register('sessions', SessionsControl, 'test')
-    cli.register('user', UserControl, 'test')
-    cli.register('group', GroupControl, 'test')
+def users_groups(conn):
+    admin = conn.getAdminService()
 
+    groups = {}
     group_info = []
     for gname, gperms in GROUPS_TO_CREATE:
-        cli.invoke(['group', 'add',
-                    gname,
-                    '--type', gperms,
-                    '-k', session_uuid,
-                    '-u', user,
-                    '-s', host,
-                    '-p', port])
-        gid = ezomero.get_group_id(conn, gname)
+        group = ExperimenterGroupI()
+        group.name = rstring(gname)
+        group.ldap = rbool(False)
+        group.details.permissions = PermissionsI(GROUP_PERMS[gperms])
+        gid = admin.createGroup(group)
+        groups[gname] = ExperimenterGroupI(gid, False)
         group_info.append([gname, gid])
 
+    # as with `omero user add`, users also join the system 'user' group
+    user_group = ExperimenterGroupI(admin.getSecurityRoles().userGroupId,
+                                    False)
     user_info = []
     for user, groups_add, groups_own in USERS_TO_CREATE:
-        # make user while adding to first group
-        cli.invoke(['user', 'add',
-                    user,
-                    'test',
-                    'tester',
-                    '--group-name', groups_add[0],
-                    '-e', 'useremail@jax.org',
-                    '-P', 'abc123',
-                    '-k', session_uuid,
-                    '-u', user,
-                    '-s', host,
-                    '-p', port])
-
-        # add user to rest of groups
-        if len(groups_add) > 1:
-            for group in groups_add[1:]:
-                cli.invoke(['group', 'adduser',
-                            '--user-name', user,
-                            '--name', group,
-                            '-k', session_uuid,
-                            '-u', user,
-                            '-s', host,
-                            '-p', port])
+        experimenter = ExperimenterI()
+        experimenter.omeName = rstring(user)
+        experimenter.firstName = rstring('test')
+        experimenter.lastName = rstring('tester')
+        experimenter.email = rstring('useremail@jax.org')
+        experimenter.ldap = rbool(False)
+        other_groups = [user_group] + [groups[g] for g in groups_add[1:]]
+        uid = admin.createExperimenterWithPassword(experimenter,
+                                                   rstring('abc123'),
+                                                   groups[groups_add[0]],
+                                                   other_groups)
 
         # make user owner of listed groups
-        if len(groups_own) > 0:
-            for group in groups_own:
-                cli.invoke(['group', 'adduser',
-                            '--user-name', user,
-                            '--name', group,
-                            '--as-owner',
-                            '-k', session_uuid,
-                            '-u', user,
-                            '-s', host,
-                            '-p', port])
-        uid = ezomero.get_user_id(conn, user)
+        for group in groups_own:
+            admin.addGroupOwners(groups[group], [ExperimenterI(uid, False)])
         user_info.append([user, uid])
 
     return (group_info, user_info)
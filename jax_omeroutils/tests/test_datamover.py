@@ -10,6 +10,14 @@ def test_calculatemd5():
     assert known_hash == datamover.calculate_md5(test_data)
 
 
+def test_calculate_digest():
+    known_hash = '9bdc42b716e4fe0fd91be1f67027e1ad'
+    test_data = Path('./jax_omeroutils/tests/data/valid_test.tif')
+    assert known_hash == datamover.calculate_digest(test_data)
+    assert (datamover.calculate_digest(test_data, algorithm='md5') ==
+            datamover.calculate_md5(test_data))
+
+
 def test_file_mover(tmp_path):
     test_data = Path('./jax_omeroutils/tests/data/valid_test.tif')
     test_data_temp = tmp_path / 'testdir'
@@ -20,6 +28,17 @@ def test_file_mover(tmp_path):
     assert result == expected_path
 
 
+def test_file_mover_existing_copy(tmp_path):
+    test_data = Path('./jax_omeroutils/tests/data/valid_test.tif')
+    test_data_temp = tmp_path / 'testdir'
+    test_data_temp.mkdir()
+    shutil.copy2(test_data, test_data_temp)
+    shutil.copy2(test_data, tmp_path)
+    result = datamover.file_mover(test_data_temp / test_data.name, tmp_path)
+    assert result == str(tmp_path / test_data.name)
+    assert not (test_data_temp / test_data.name).exists()
+
+
 def test_DataMover(tmp_path):
     src_dir = tmp_path / 'src'
     src_dir.mkdir()
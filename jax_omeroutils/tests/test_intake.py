@@ -4,6 +4,8 @@ from pathlib import Path
 from jax_omeroutils import intake
 from math import nan
 from copy import deepcopy
+from datetime import date, datetime, time
+from openpyxl import Workbook
 
 
 @pytest.fixture(scope='session')
@@ -19,6 +21,22 @@ def md_dict():
     return md
 
 
+def write_form(path, columns, rows, sheet_name='Submission Form'):
+    # Minimal submission form: user/group header, column names, file rows
+    wb = Workbook()
+    ws = wb.active
+    ws.title = sheet_name
+    ws.append(['OMERO user:', 'testuser'])
+    ws.append(['OMERO group:', 'testgroup'])
+    ws.append([])
+    ws.append([])
+    ws.append(columns)
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+    return path
+
+
 # load_md
 def test_load_md_invalid_ftypes(tmp_path):
     open(tmp_path / 'md2.xls.5', 'a').close()
@@ -44,6 +62,150 @@ def test_load_md_good():
     assert md['file_metadata'][0]['filename'] == 'my_image.tif'
 
 
+def test_load_md_header_body():
+    md_path = Path('./jax_omeroutils/tests/data/OMERO_submission_form.xlsx')
+    md = intake.load_md_header(md_path, sheet_name="Example Form")
+    assert md == {'omero_user': 'djme', 'omero_group': 'Research IT'}
+    file_md = intake.load_md_body(md_path, sheet_name="Example Form")
+    assert len(file_md) == 3
+    assert file_md[0]['filename'] == 'my_image.tif'
+    assert intake.load_md_header(None) is None
+
+
+def test_ImportBatch_load_md_header_then_body(tmp_path):
+    write_form(tmp_path / 'md.xlsx', ['filename', 'project', 'dataset'],
+               [['a.tif', 'proj', 'ds'], ['b.tif', 'proj', 'ds']])
+    batch = intake.ImportBatch(None, tmp_path)
+    batch.load_md_header()
+    assert batch.md == {'omero_user': 'testuser', 'omero_group': 'testgroup'}
+    batch.load_md()
+    assert [r['filename'] for r in batch.md['file_metadata']] == ['a.tif',
+                                                                  'b.tif']
+    assert batch._md_rows is None
+
+
+def test_ImportBatch_closes_md_rows(tmp_path):
+    write_form(tmp_path / 'md.xlsx', ['filename', 'project', 'dataset'],
+               [['a.tif', 'proj', 'ds']])
+    with intake.ImportBatch(None, tmp_path) as batch:
+        batch.load_md_header()
+        with pytest.raises(ValueError):
+            batch.load_md(sheet_name='Other Sheet')
+        assert batch._md_rows is not None
+    assert batch._md_rows is None
+
+
+def test_load_md_missing_sheet(tmp_path):
+    md_path = write_form(tmp_path / 'md.xlsx',
+                         ['filename', 'project', 'dataset'],
+                         [['a.tif', 'proj', 'ds']])
+    with pytest.raises(ValueError):
+        intake.load_md_from_file(md_path, sheet_name='No Such Sheet')
+
+
+def test_load_md_skips_blank_rows(tmp_path):
+    md_path = write_form(tmp_path / 'md.xlsx',
+                         ['filename', 'project', 'dataset'],
+                         [['a.tif', 'proj', 'ds'],
+                          [None, None, None],
+                          ['b.tif', 'proj', 'ds']])
+    md = intake.load_md_from_file(md_path, sheet_name='Submission Form')
+    assert [r['filename'] for r in md['file_metadata']] == ['a.tif', 'b.tif']
+
+
+def test_load_md_drops_incomplete_rows(tmp_path):
+    md_path = write_form(tmp_path / 'md.xlsx',
+                         ['filename', 'project', 'dataset'],
+                         [['a.tif', 'proj', 'ds'],
+                          ['b.tif', None, 'ds'],
+                          [None, 'proj', 'ds']])
+    md = intake.load_md_from_file(md_path, sheet_name='Submission Form')
+    assert [r['filename'] for r in md['file_metadata']] == ['a.tif']
+
+    md_path = write_form(tmp_path / 'md_screen.xlsx', ['filename', 'screen'],
+                         [['a.tif', 'scr'], ['b.tif', None]])
+    md = intake.load_md_from_file(md_path, sheet_name='Submission Form')
+    assert [r['filename'] for r in md['file_metadata']] == ['a.tif']
+
+
+def test_load_md_drops_empty_columns(tmp_path):
+    md_path = write_form(tmp_path / 'md.xlsx',
+                         ['filename', 'project', 'dataset', 'notes'],
+                         [['a.tif', 'proj', 'ds', None]])
+    md = intake.load_md_from_file(md_path, sheet_name='Submission Form')
+    assert 'notes' not in md['file_metadata'][0]
+
+
+def test_load_md_unnamed_and_duplicate_columns(tmp_path):
+    md_path = write_form(tmp_path / 'md.xlsx',
+                         ['filename', 'project', 'dataset', None, 'species',
+                          'species'],
+                         [['a.tif', 'proj', 'ds', 'x', 'mouse', 'human']])
+    md = intake.load_md_from_file(md_path, sheet_name='Submission Form')
+    row = md['file_metadata'][0]
+    assert row['Unnamed: 3'] == 'x'
+    assert row['species'] == 'mouse'
+    assert row['species.1'] == 'human'
+
+
+def test_load_md_cell_values(tmp_path):
+    md_path = write_form(tmp_path / 'md.xlsx',
+                         ['filename', 'project', 'dataset', 'age', 'weight'],
+                         [['a.tif', 'proj', ' ds ', 3.0, 2.5]])
+    md = intake.load_md_from_file(md_path, sheet_name='Submission Form')
+    row = md['file_metadata'][0]
+    assert row['dataset'] == 'ds'
+    assert row['age'] == '3'
+    assert row['weight'] == '2.5'
+
+
+def test_load_md_same_with_both_readers(tmp_path, monkeypatch):
+    pytest.importorskip('python_calamine')
+    md_path = write_form(
+        tmp_path / 'md.xlsx',
+        ['filename', 'project', 'dataset', 'born', 'scanned', 'time', 'age'],
+        [['a.tif', 'proj', 'ds', date(2020, 1, 2),
+          datetime(2020, 1, 2, 10, 30), time(12, 30), 3.0]])
+    md_calamine = intake.load_md_from_file(md_path,
+                                           sheet_name='Submission Form')
+    monkeypatch.setattr(intake, 'CalamineWorkbook', None)
+    md_openpyxl = intake.load_md_from_file(md_path,
+                                           sheet_name='Submission Form')
+    assert md_calamine == md_openpyxl
+    row = md_openpyxl['file_metadata'][0]
+    assert row['born'] == '2020-01-02 00:00:00'
+    assert row['scanned'] == '2020-01-02 10:30:00'
+
+
+def test_load_md_blank_tail_under_max_rows(caplog):
+    rows = iter([('filename', 'project', 'dataset'),
+                 ('a.tif', 'proj', 'ds'),
+                 ('b.tif', 'proj', 'ds')] +
+                [(None, None, None)] * 20)
+    md = intake._parse_md_body(rows, max_rows=2)
+    assert [r['filename'] for r in md] == ['a.tif', 'b.tif']
+    assert not caplog.records
+
+
+def test_load_md_too_many_rows(tmp_path):
+    md_path = write_form(
+        tmp_path / 'md.xlsx',
+        ['filename', 'project', 'dataset'],
+        [['a.tif', 'proj', 'ds'], [None, None, None], ['b.tif', 'proj', 'ds']])
+    with pytest.raises(ValueError):
+        intake.load_md_from_file(md_path, sheet_name='Submission Form',
+                                 max_rows=1)
+
+
+def test_load_md_reads_past_blank_run():
+    rows = iter([('filename', 'project', 'dataset'),
+                 ('a.tif', 'proj', 'ds')] +
+                [(None, None, None)] * 2000 +
+                [('c.tif', 'proj', 'ds')])
+    md = intake._parse_md_body(rows, max_rows=None)
+    assert [r['filename'] for r in md] == ['a.tif', 'c.tif']
+
+
 # find_md
 def test_find_md_good(tmp_path):
     open(tmp_path / 'md.xlsx', 'a').close()
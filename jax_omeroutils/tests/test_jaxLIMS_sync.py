@@ -0,0 +1,48 @@
+import jaxLIMS_sync
+from omero.gateway import ServiceOptsDict
+from omero.rtypes import rlong, rstring
+
+
+class FakeQueryService:
+    # Answers the filename projection from a list of (image id, filename)
+    def __init__(self, files):
+        self.files = files
+        self.calls = []
+
+    def projection(self, query, params, ctx):
+        names = [n.val for n in params.map['names'].val]
+        self.calls.append((names, ctx.getOmeroGroup()))
+        return [[rlong(i), rstring(n)] for i, n in self.files if n in names]
+
+
+class FakeConn:
+    def __init__(self, files):
+        self.SERVICE_OPTS = ServiceOptsDict()
+        self.query_service = FakeQueryService(files)
+
+    def getQueryService(self):
+        return self.query_service
+
+
+def test_get_image_ids_by_filename():
+    conn = FakeConn([(1, 'a.tif'), (2, 'b.tif'), (3, 'a.tif'), (4, 'c.tif')])
+    ids = jaxLIMS_sync.get_image_ids_by_filename(
+        conn, [3, 2, 1], ['a.tif', 'b.tif', 'c.tif', None, 'a.tif'])
+    # image 4 is not an orphan, orphan order is kept
+    assert dict(ids) == {'a.tif': [3, 1], 'b.tif': [2]}
+    assert [g for _, g in conn.query_service.calls] == ['-1']
+    assert conn.SERVICE_OPTS.getOmeroGroup() is None
+
+
+def test_get_image_ids_by_filename_batches(monkeypatch):
+    monkeypatch.setattr(jaxLIMS_sync, 'QUERY_BATCH_SIZE', 2)
+    names = [f'{i}.tif' for i in range(5)]
+    conn = FakeConn(list(enumerate(names)))
+    ids = jaxLIMS_sync.get_image_ids_by_filename(conn, list(range(5)), names)
+    assert [len(n) for n, _ in conn.query_service.calls] == [2, 2, 1]
+    assert dict(ids) == {n: [i] for i, n in enumerate(names)}
+
+    conn = FakeConn(list(enumerate(names)))
+    jaxLIMS_sync.get_image_ids_by_filename(conn, list(range(4)), names[:4])
+    assert [len(n) for n, _ in conn.query_service.calls] == [2, 2]
+    assert jaxLIMS_sync.get_image_ids_by_filename(conn, [], names) == {}
@@ -0,0 +1,87 @@
+import pytest
+from ome_types import from_xml, to_xml
+from jax_omeroutils import xml_editor
+
+
+IMAGE_XML = """
+  <Image ID="Image:{i}" Name="{name}">
+    <Pixels ID="Pixels:{i}" DimensionOrder="XYZCT" Type="uint8"
+            SizeX="1" SizeY="1" SizeZ="1" SizeC="1" SizeT="1">
+      <MetadataOnly/>
+    </Pixels>
+    <AnnotationRef ID="Annotation:{i}"/>
+  </Image>"""
+
+PATH_XML = """
+    <XMLAnnotation ID="Annotation:{i}"
+                   Namespace="openmicroscopy.org/cli/transfer">
+      <Value>
+        <CLITransferServerPath><Path>{name}</Path></CLITransferServerPath>
+      </Value>
+    </XMLAnnotation>"""
+
+
+@pytest.fixture
+def ome():
+    # One image per file, each pointing at an XMLAnnotation with its path
+    names = ['a.tif', 'b.tif', 'c.tif']
+    xml = ('<OME xmlns="http://www.openmicroscopy.org/Schemas/OME/2016-06">' +
+           ''.join(IMAGE_XML.format(i=i, name=n)
+                   for i, n in enumerate(names, start=1)) +
+           '<StructuredAnnotations>' +
+           ''.join(PATH_XML.format(i=i, name=n)
+                   for i, n in enumerate(names, start=1)) +
+           '</StructuredAnnotations></OME>')
+    return from_xml(xml)
+
+
+@pytest.fixture
+def imp_json():
+    md = [{'filename': 'a.tif', 'project': 'p', 'dataset': 'd1',
+           'species': 'mouse'},
+          {'filename': 'b.tif', 'project': 'p', 'dataset': 'd2',
+           'species': 'mouse'},
+          {'filename': 'c.tif', 'project': 'q', 'dataset': 'd1',
+           'species': 'human'}]
+    return {'user_supplied_md': {'file_metadata': md}}
+
+
+def test_apply_metadata_matches_stages(ome, imp_json):
+    staged = xml_editor.add_projects_datasets(ome, imp_json)
+    staged = xml_editor.add_screens(staged, imp_json)
+    staged = xml_editor.add_annotations(staged, imp_json)
+    staged = xml_editor.move_objects(staged, imp_json)
+    assert to_xml(xml_editor.apply_metadata(ome, imp_json)) == to_xml(staged)
+
+
+def test_apply_metadata_shares_annotations(ome, imp_json):
+    newome = xml_editor.apply_metadata(ome, imp_json)
+    # rows with the same key-value pairs share one new MapAnnotation
+    refs = {img.id: [r.id for r in img.annotation_refs]
+            for img in newome.images}
+    assert refs == {'Image:1': ['Annotation:1', 'Annotation:4'],
+                    'Image:2': ['Annotation:2', 'Annotation:4'],
+                    'Image:3': ['Annotation:3', 'Annotation:5']}
+    anns = {ann.id: ann for ann in newome.structured_annotations}
+    assert len(anns) == 5
+    for ann_id, species in [('Annotation:4', 'mouse'),
+                            ('Annotation:5', 'human')]:
+        assert anns[ann_id].namespace == xml_editor.CURRENT_MD_NS
+        assert {m.k: m.value for m in anns[ann_id].value.ms} == {
+            'species': species}
+
+    # images land in the dataset of their own project
+    projects = {p.name: [r.id for r in p.dataset_refs]
+                for p in newome.projects}
+    assert projects == {'p': ['Dataset:1', 'Dataset:2'], 'q': ['Dataset:3']}
+    images = {ds.id: [r.id for r in ds.image_refs] for ds in newome.datasets}
+    assert images == {'Dataset:1': ['Image:1'], 'Dataset:2': ['Image:2'],
+                      'Dataset:3': ['Image:3']}
+
+
+def test_apply_metadata_leaves_input(ome, imp_json):
+    before = to_xml(ome)
+    xml_editor.apply_metadata(ome, imp_json)
+    assert to_xml(ome) == before
+    assert len(ome.structured_annotations) == 3
+    assert not ome.projects and not ome.datasets
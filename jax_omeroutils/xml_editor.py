@@ -1,11 +1,10 @@
 import copy
-from os import sep
 from collections import defaultdict
 from ome_types import to_xml
 from ome_types.model import Project, Screen, Dataset, MapAnnotation
 from ome_types.model import DatasetRef, AnnotationRef, ImageRef
 from ome_types.model.screen import PlateRef
-from ome_types.model import CommentAnnotation, Map
+from ome_types.model import Map, XMLAnnotation
 from ome_types.model.map import M
 import xml.etree.cElementTree as ETree
 
@@ -35,52 +34,85 @@ def create_kv_and_ref(**kwargs):
     return kv, kvref
 
 
+def _clone_ome(ome):
+    """Return a deep copy of an OME model.
+    """
+    return copy.deepcopy(ome)
+
+
+def apply_metadata(ome, imp_json):
+    """Return a copy of ``ome`` with the submitted metadata applied.
+
+    Equivalent to running ``add_projects_datasets``, ``add_screens``,
+    ``add_annotations`` and ``move_objects`` in turn, but the OME model is
+    deep-copied once instead of at every stage, and its file paths are
+    indexed once for both the annotation and the move stages.
+    """
+    newome = _clone_ome(ome)
+    _add_projects_datasets(newome, imp_json)
+    _add_screens(newome, imp_json)
+    ann_paths = _paths_by_annotation(newome)
+    _add_annotations(newome, imp_json, ann_paths)
+    _move_objects(newome, imp_json, ann_paths)
+    return newome
+
+
 def add_projects_datasets(ome, imp_json):
-    newome = copy.deepcopy(ome)
     columns = imp_json['user_supplied_md']['file_metadata'][0].keys()
     if ('project' not in columns) or ('dataset' not in columns):
         return ome
+    newome = _clone_ome(ome)
+    _add_projects_datasets(newome, imp_json)
+    return newome
+
+
+def _add_projects_datasets(newome, imp_json):
+    md = imp_json['user_supplied_md']['file_metadata']
+    if ('project' not in md[0]) or ('dataset' not in md[0]):
+        return
     else:
-        md = imp_json['user_supplied_md']['file_metadata']
-        proj_ds = defaultdict(set)
+        # dataset names per project, deduped in row order (dict as set)
+        proj_ds = defaultdict(dict)
         for i in md:
-            proj_ds[i['project']].add(i['dataset'])
-        proj_count = 1
-        ds_count = 1
-        for project in proj_ds.keys():
-            id = f"Project:{proj_count}"
-            proj_count += 1
-            name = project
-            proj = create_proj(id=id, name=name)
-            for dataset in proj_ds[project]:
-                id = f"Dataset:{ds_count}"
-                ds_count += 1
-                ds, ds_ref = create_dataset_and_ref(id=id, name=dataset)
-                newome.datasets.append(ds)
+            proj_ds[i['project']][i['dataset']] = None
+        new_projects = []
+        new_datasets = []
+        for proj_count, (project, datasets) in enumerate(proj_ds.items(),
+                                                         start=1):
+            proj = create_proj(id=f"Project:{proj_count}", name=project)
+            for dataset in datasets:
+                ds, ds_ref = create_dataset_and_ref(
+                    id=f"Dataset:{len(new_datasets) + 1}", name=dataset)
+                new_datasets.append(ds)
                 proj.dataset_ref.append(ds_ref)
-            newome.projects.append(proj)
-    return newome
+            new_projects.append(proj)
+        newome.datasets.extend(new_datasets)
+        newome.projects.extend(new_projects)
 
 
 def add_screens(ome, imp_json):
-    newome = copy.deepcopy(ome)
     columns = imp_json['user_supplied_md']['file_metadata'][0].keys()
     if 'screen' not in columns:
         return ome
+    newome = _clone_ome(ome)
+    _add_screens(newome, imp_json)
+    return newome
+
+
+def _add_screens(newome, imp_json):
+    md = imp_json['user_supplied_md']['file_metadata']
+    if 'screen' not in md[0]:
+        return
     else:
-        md = imp_json['user_supplied_md']['file_metadata']
-        scr_count = 1
-        screens = [i['screen'] for i in md]
-        for scr in list(set(screens)):
-            id = f"Screen:{scr_count}"
-            scr_count += 1
-            scr_obj = create_screen(id=id, name=scr)
+        # dict.fromkeys dedupes in row order, so Screen ids are stable
+        screens = dict.fromkeys(i['screen'] for i in md)
+        for scr_count, scr in enumerate(screens, start=1):
+            scr_obj = create_screen(id=f"Screen:{scr_count}", name=scr)
             newome.screens.append(scr_obj)
-    return newome
 
 
 def add_annotations(ome, imp_json):
-    columns = list(imp_json['user_supplied_md']['file_metadata'][0].keys())
+    columns = imp_json['user_supplied_md']['file_metadata'][0].keys()
     if 'project' in columns:
         newome = add_annotations_images(ome, imp_json)
         return newome
@@ -90,82 +122,82 @@ def add_annotations(ome, imp_json):
     return ome
 
 
-def add_annotations_images(ome, imp_json):
-    newome = copy.deepcopy(ome)
-    columns = list(imp_json['user_supplied_md']['file_metadata'][0].keys())
+def _add_annotations(newome, imp_json, ann_paths=None):
+    columns = imp_json['user_supplied_md']['file_metadata'][0].keys()
     if 'project' in columns:
-        columns.remove('project')
-    if 'dataset' in columns:
-        columns.remove('dataset')
+        _add_annotations_images(newome, imp_json, ann_paths)
+    elif 'screen' in columns:
+        _add_annotations_plates(newome, imp_json, ann_paths)
+
+
+def add_annotations_images(ome, imp_json):
+    newome = _clone_ome(ome)
+    _add_annotations_images(newome, imp_json)
+    return newome
+
+
+def _add_annotations_images(newome, imp_json, ann_paths=None):
     md = imp_json['user_supplied_md']['file_metadata']
-    max_ann = 0
-    for ann in newome.structured_annotations:
-        clean_id = int(ann.id.split(":")[-1])
-        if clean_id > max_ann:
-            max_ann = clean_id
-    ann_count = max_ann + 1
+    columns = [c for c in md[0] if c not in ('project', 'dataset', 'filename')]
+    ann_count = _max_annotation_id(newome) + 1
+    image_ids = _ids_by_path(newome, newome.images, ann_paths)
+    images = {img.id: img for img in newome.images}
+    ann_ids = {}
     for line in md:
         filename = line['filename']
-        ann_dict = {i: line[i] for i in columns}
-        ann_dict.pop('filename')
-        ann_dict = {k: v for k, v in ann_dict.items() if isinstance(v, str)}
-        img_ids = get_image_ids(filename, ome)
-        for img in newome.images:
-            if img.id in img_ids:
-                mmap = []
-                for _key, _value in ann_dict.items():
-                    if _value:
-                        mmap.append(M(k=_key, value=str(_value)))
-                    else:
-                        mmap.append(M(k=_key, value=''))
-                kv, annref = create_kv_and_ref(
+        ann_dict = {i: line[i] for i in columns if isinstance(line[i], str)}
+        # rows with identical key-value pairs share one annotation
+        ann_key = tuple(ann_dict.items())
+        for img_id in dict.fromkeys(image_ids.get(filename, [])):
+            img = images[img_id]
+            if ann_key not in ann_ids:
+                mmap = [M(k=_key, value=str(_value) if _value else '')
+                        for _key, _value in ann_dict.items()]
+                kv, _ = create_kv_and_ref(
                     id=f"Annotation:{ann_count}",
                     namespace=CURRENT_MD_NS,
                     value=Map(ms=mmap))
                 ann_count += 1
                 newome.structured_annotations.append(kv)
-                img.annotation_ref.append(annref)
-    return newome
+                ann_ids[ann_key] = kv.id
+            img.annotation_ref.append(AnnotationRef(id=ann_ids[ann_key]))
 
 
 def add_annotations_plates(ome, imp_json):
-    newome = copy.deepcopy(ome)
-    columns = list(imp_json['user_supplied_md']['file_metadata'][0].keys())
-    if 'screen' in columns:
-        columns.remove('screen')
+    newome = _clone_ome(ome)
+    _add_annotations_plates(newome, imp_json)
+    return newome
+
+
+def _add_annotations_plates(newome, imp_json, ann_paths=None):
     md = imp_json['user_supplied_md']['file_metadata']
-    max_ann = 0
-    for ann in newome.structured_annotations:
-        clean_id = int(ann.id.split(":")[-1])
-        if clean_id > max_ann:
-            max_ann = clean_id
-    ann_count = max_ann + 1
+    columns = [c for c in md[0] if c not in ('screen', 'filename')]
+    ann_count = _max_annotation_id(newome) + 1
+    plate_ids = _ids_by_path(newome, newome.plates, ann_paths)
+    plates = {pl.id: pl for pl in newome.plates}
+    ann_ids = {}
     for line in md:
         filename = line['filename']
-        ann_dict = {i: line[i] for i in columns}
-        ann_dict.pop('filename')
-        ann_dict = {k: v for k, v in ann_dict.items() if isinstance(v, str)}
-        pl_ids = get_plate_ids(filename, ome)
-        for pl in newome.plates:
-            if pl.id in pl_ids:
-                mmap = []
-                for _key, _value in ann_dict.items():
-                    if _value:
-                        mmap.append(M(k=_key, value=str(_value)))
-                    else:
-                        mmap.append(M(k=_key, value=''))
-                kv, annref = create_kv_and_ref(
+        ann_dict = {i: line[i] for i in columns if isinstance(line[i], str)}
+        # rows with identical key-value pairs share one annotation
+        ann_key = tuple(ann_dict.items())
+        for pl_id in dict.fromkeys(plate_ids.get(filename, [])):
+            pl = plates[pl_id]
+            if ann_key not in ann_ids:
+                mmap = [M(k=_key, value=str(_value) if _value else '')
+                        for _key, _value in ann_dict.items()]
+                kv, _ = create_kv_and_ref(
                     id=f"Annotation:{ann_count}",
                     namespace=CURRENT_MD_NS,
                     value=Map(ms=mmap))
                 ann_count += 1
                 newome.structured_annotations.append(kv)
-                pl.annotation_ref.append(annref)
-    return newome
+                ann_ids[ann_key] = kv.id
+            pl.annotation_ref.append(AnnotationRef(id=ann_ids[ann_key]))
 
 
 def move_objects(ome, imp_json):
-    columns = list(imp_json['user_supplied_md']['file_metadata'][0].keys())
+    columns = imp_json['user_supplied_md']['file_metadata'][0].keys()
     if 'project' in columns:
         newome = move_images(ome, imp_json)
         return newome
@@ -175,85 +207,113 @@ def move_objects(ome, imp_json):
     return ome
 
 
+def _move_objects(newome, imp_json, ann_paths=None):
+    columns = imp_json['user_supplied_md']['file_metadata'][0].keys()
+    if 'project' in columns:
+        _move_images(newome, imp_json, ann_paths)
+    elif 'screen' in columns:
+        _move_plates(newome, imp_json, ann_paths)
+
+
 def move_images(ome, imp_json):
-    newome = copy.deepcopy(ome)
+    newome = _clone_ome(ome)
+    _move_images(newome, imp_json)
+    return newome
+
+
+def _move_images(newome, imp_json, ann_paths=None):
     md = imp_json['user_supplied_md']['file_metadata']
+    image_ids = _ids_by_path(newome, newome.images, ann_paths)
+    datasets = {ds.id: ds for ds in newome.datasets}
+    # (project name, dataset name) -> {dataset id: dataset}
+    proj_ds = defaultdict(dict)
+    for proj in newome.projects:
+        for dsref in proj.dataset_refs:
+            ds = datasets.get(dsref.id)
+            if ds is not None:
+                proj_ds[(proj.name, ds.name)][ds.id] = ds
     for line in md:
-        dsname = line['dataset']
-        projname = line['project']
-        right_ds = []
-        for proj in newome.projects:
-            if projname == proj.name:
-                for dsref in proj.dataset_refs:
-                    for ds in newome.datasets:
-                        if dsref.id == ds.id and ds.name == dsname:
-                            right_ds.append(ds.id)
-        images = []
+        right_ds = proj_ds.get((line['project'], line['dataset']), {})
         filename = line['filename']
-        ids = get_image_ids(filename, newome)
+        ids = image_ids.get(filename, [])
         for imgid in ids:
             imgref = ImageRef(id=imgid)
-            for ds in newome.datasets:
-                    if ds.id in right_ds:
-                        ds.image_ref.append(imgref)
-    return newome
+            for ds in right_ds.values():
+                ds.image_ref.append(imgref)
+
+
+def _max_annotation_id(ome):
+    """Return the highest numeric suffix among the annotation ids.
+    """
+    return max((int(ann.id.rpartition(':')[2])
+                for ann in ome.structured_annotations), default=0)
 
 
 def get_image_ids(filename, ome):
-    ann_ids = []
-    ids = []
-    for an_loop in ome.structured_annotations:
-        tree = ETree.fromstring(to_xml(an_loop.value,
-                                        canonicalize=True))
-        for el in tree:
-            if el.tag.rpartition('}')[2] == "CLITransferServerPath":
-                for el2 in el:
-                    if el2.tag.rpartition('}')[2] == "Path":
-                        fpath = el2.text
-                        if fpath == filename:
-                            ann_ids.append(an_loop.id)
-    for img in ome.images:
-        for annref in img.annotation_refs:
-            if annref.id in ann_ids:
-                ids.append(img.id)
-    return ids
+    return _ids_by_path(ome, ome.images).get(filename, [])
 
 
 def get_plate_ids(filename, ome):
-    ann_ids = []
-    ids = []
+    return _ids_by_path(ome, ome.plates).get(filename, [])
+
+
+def _paths_by_annotation(ome):
+    """Map annotation ids to the CLITransferServerPath paths they hold.
+
+    Each annotation is serialized and parsed once, however many files are
+    later looked up. Paths are only ever stored in XML annotations, so
+    map annotations (including the ones added here) are skipped without
+    a round-trip through XML.
+    """
+    ann_paths = defaultdict(list)
     for an_loop in ome.structured_annotations:
+        if not isinstance(an_loop, XMLAnnotation):
+            continue
         tree = ETree.fromstring(to_xml(an_loop.value,
-                                        canonicalize=True))
+                                       canonicalize=True))
         for el in tree:
             if el.tag.rpartition('}')[2] == "CLITransferServerPath":
                 for el2 in el:
                     if el2.tag.rpartition('}')[2] == "Path":
-                        fpath = el2.text
-                        if fpath == filename:
-                            ann_ids.append(an_loop.id)
-    for pl in ome.plates:
-        for annref in pl.annotation_refs:
-            if annref.id in ann_ids:
-                ids.append(pl.id)
+                        ann_paths[an_loop.id].append(el2.text)
+    return ann_paths
+
+
+def _ids_by_path(ome, objects, ann_paths=None):
+    """Map each server path to the ids of ``objects`` annotated with it.
+
+    ``objects`` is ``ome.images`` or ``ome.plates``. Building this once
+    turns the per-row ``get_image_ids``/``get_plate_ids`` scans into dict
+    lookups. ``ann_paths`` is the output of ``_paths_by_annotation``, which
+    is computed here if not given.
+    """
+    if ann_paths is None:
+        ann_paths = _paths_by_annotation(ome)
+    ids = defaultdict(list)
+    for obj in objects:
+        for annref in obj.annotation_refs:
+            for fpath in ann_paths.get(annref.id, ()):
+                ids[fpath].append(obj.id)
     return ids
 
 
 def move_plates(ome, imp_json):
-    newome = copy.deepcopy(ome)
+    newome = _clone_ome(ome)
+    _move_plates(newome, imp_json)
+    return newome
+
+
+def _move_plates(newome, imp_json, ann_paths=None):
     md = imp_json['user_supplied_md']['file_metadata']
+    plate_ids = _ids_by_path(newome, newome.plates, ann_paths)
+    screens = defaultdict(list)
+    for scr in newome.screens:
+        screens[scr.name].append(scr)
     for line in md:
-        scrname = line['screen']
-        right_scr = []
-        for scr in newome.screens:
-            if scrname == scr.name:
-                right_scr.append(scr.id)
-        plates = []
+        right_scr = screens.get(line['screen'], [])
         filename = line['filename']
-        ids = get_plate_ids(filename, newome)
+        ids = plate_ids.get(filename, [])
         for plid in ids:
             plref = PlateRef(id=plid)
-            for scr in newome.screens:
-                    if scr.id in right_scr:
-                        scr.plate_refs.append(plref)
-    return newome
+            for scr in right_scr:
+                scr.plate_refs.append(plref)
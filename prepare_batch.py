@@ -22,15 +22,17 @@ def main(import_batch_directory, log_directory, timestamp):
                         port=OMERO_PORT,
                         secure=True)
     conn.connect()
-    batch = ImportBatch(conn, import_batch_directory)
-    batch.set_logging(log_directory, timestamp)
-    batch.load_md()
-    if not batch.md:
-        raise ValueError('No metadata file found.')
+    # the batch closes the metadata form if validation fails in between
+    with ImportBatch(conn, import_batch_directory) as batch:
+        batch.set_logging(log_directory, timestamp)
+        batch.load_md_header()
+        if not batch.md:
+            raise ValueError('No metadata file found.')
+        batch.validate_user_group()
+        batch.load_md()
     batch.validate_import_md()
     if not batch.valid_md:
         raise ValueError('Metadata file has fatal errors.')
-    batch.validate_user_group()
     batch.set_server_path()
     batch.load_targets()
     batch.write_json()
@@ -20,5 +20,9 @@ setuptools.setup(
         'openpyxl==3.0.9',
         'omero-cli-transfer>=1.0.0,<1.1.0'
     ],
+    extras_require={
+        'calamine': ['python-calamine>=0.3.0'],
+        'orjson': ['orjson>=3.0.0']
+    },
     python_requires='>=3.8'
 )
\ No newline at end of file